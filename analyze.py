@@ -5,11 +5,10 @@ import os
 
 import re
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
 from fuzzywuzzy import process  # Fuzzy string matching
 import seaborn as sns
+from pricing_model import blend_price, fit_price_model, predict_price
+from recommendation_table import recommendation_table
 
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from textblob import TextBlob
@@ -19,28 +18,24 @@ from textblob import TextBlob
 DATA_FILE = "product_data.csv"
 
 def save_data_to_csv(df):
+    """Replaces the data file with df."""
     df.to_csv(DATA_FILE, index=False, mode='w')
-    if os.path.exists(DATA_FILE):
-        df.to_csv(DATA_FILE, mode='a', index=False, header=False)
-    else:
-        df.to_csv(DATA_FILE, index=False)
 
-def preprocess_data():
-    if not os.path.exists(DATA_FILE):
-        return None
+    # ✅ Products no longer in the data file must not keep a materialized price
+    recommendation_table.retain(df["Product Title"])
 
-    df = pd.read_csv(DATA_FILE)
+def append_data_to_csv(df):
+    """Appends rows to the data file, writing the header only when the file is new."""
+    df.to_csv(DATA_FILE, mode='a', index=False, header=not os.path.exists(DATA_FILE))
 
+def normalize_data(df):
+    """Cleans raw scraped or feed rows in place: placeholders, ratings and prices."""
     # ✅ Replace unwanted text with NaN
     df.replace(["No Data", "No Rating", "Not Available"], np.nan, inplace=True)
 
     # ✅ Convert "Rating (⭐ out of 5)" to numeric, handling errors
     df["Rating (⭐ out of 5)"] = pd.to_numeric(df["Rating (⭐ out of 5)"], errors="coerce")
 
-    # ✅ Ensure median rating calculation works
-    median_rating = df["Rating (⭐ out of 5)"].dropna().median() if not df["Rating (⭐ out of 5)"].dropna().empty else 4.0
-    df["Rating (⭐ out of 5)"].fillna(median_rating, inplace=True)
-
     # ✅ Convert "No. of Ratings" to integer safely
     df["No. of Ratings"] = pd.to_numeric(df["No. of Ratings"], errors="coerce").fillna(0).astype(int)
 
@@ -50,6 +45,18 @@ def preprocess_data():
     # ✅ Convert Price to float, replacing errors with NaN
     df["Price"] = pd.to_numeric(df["Price"], errors="coerce")
 
+    return df
+
+def preprocess_data():
+    if not os.path.exists(DATA_FILE):
+        return None
+
+    df = normalize_data(pd.read_csv(DATA_FILE))
+
+    # ✅ Ensure median rating calculation works
+    median_rating = df["Rating (⭐ out of 5)"].dropna().median() if not df["Rating (⭐ out of 5)"].dropna().empty else 4.0
+    df["Rating (⭐ out of 5)"].fillna(median_rating, inplace=True)
+
     # ✅ Remove rows where price is missing (if necessary)
     df.dropna(subset=["Price"], inplace=True)
 
@@ -57,7 +64,14 @@ def preprocess_data():
 
 
 
-def recommend_price(selected_product, cost_price):
+def price_components(selected_product):
+    """Returns (predicted_price, competitor_price) for the best match of selected_product, or None."""
+    # ✅ Exact matches are served from the materialized table
+    materialized = recommendation_table.lookup(selected_product)
+    if materialized is not None:
+        st.info(f"🔍 Best match found: {selected_product} (Confidence: 100%)")
+        return materialized["Predicted Price"], materialized["Competitor Price"]
+
     df = preprocess_data()
     if df is None or df.empty:
         st.error("⚠ No valid data available for analysis.")
@@ -118,37 +132,27 @@ def recommend_price(selected_product, cost_price):
         st.error("❌ Product not found in dataset.")
         return None
 
-    feature_columns = ["No. of Ratings", "Rating (⭐ out of 5)"]
-    df_filtered["Log No. of Ratings"] = np.log1p(df_filtered["No. of Ratings"])  # ✅ Log transformation
-
-    X = df_filtered[["Log No. of Ratings", "Rating (⭐ out of 5)"]]
-    y = df_filtered["Price"]
-
-    X.fillna(X.median(), inplace=True)
-    y.fillna(y.median(), inplace=True)
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
-
-    model = RandomForestRegressor(n_estimators=200, min_samples_split=5, random_state=42)
-    model.fit(X_train, y_train)
+    # ✅ Model is chosen by group size (median baseline, ridge or gradient boosting)
+    scaler, model = fit_price_model(df_filtered)
 
     product_data = df[df["Product Title"] == best_match]
     if product_data.empty:
         st.error("❌ Best match not found in dataset for pricing.")
         return None
 
-    product_features = product_data[["No. of Ratings", "Rating (⭐ out of 5)"]].copy()
-    product_features["Log No. of Ratings"] = np.log1p(product_features["No. of Ratings"])
-    product_features_scaled = scaler.transform(product_features[["Log No. of Ratings", "Rating (⭐ out of 5)"]])
-
-    predicted_price = model.predict(product_features_scaled)[0]
+    predicted_price = predict_price(scaler, model, product_data)[0]
     competitor_price = df_filtered["Price"].median()
 
+    return predicted_price, competitor_price
+
+
+def recommend_price(selected_product, cost_price):
+    components = price_components(selected_product)
+    if components is None:
+        return None
+
     # Optimized final price (Weighted)
-    recommended_price = (predicted_price * 0.5) + (competitor_price * 0.3) + (cost_price * 1.2 * 0.2)
+    recommended_price = blend_price(*components, cost_price)
 
     return round(recommended_price, 2)
 
@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import uuid
+import plotly.graph_objects as go
 from selenium import webdriver
-from fetch import setup_driver, fetch_flipkart_products, fetch_croma_products, fetch_reliance_products, flipkart_product_urls, fetch_reviews
+from fetch import setup_driver, fetch_retailer_products, product_url_registry, fetch_reviews, REVIEW_XPATHS
 from analyze import analyze_sentiment
-from analyze import save_data_to_csv, preprocess_data, recommend_price
+from analyze import preprocess_data, recommend_price, price_components
+from ingest import store_rows
+from pricing_model import sweep_prices
 from visualization import plot_price_analysis
+from recommendation_table import recommendation_table
 
 # 🎨 Streamlit UI - Page Config
 st.set_page_config(page_title="Price & Rating Comparison", page_icon="📊", layout="wide")
@@ -16,6 +22,8 @@ if "df_reliance" not in st.session_state:
     st.session_state.df_reliance = None
 if "df_croma" not in st.session_state:
     st.session_state.df_croma = None
+if "session_key" not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex  # ✅ Keys this session's product URLs
 
 # 🎯 Sidebar
 st.sidebar.title("🔍 Search & Compare")
@@ -35,56 +43,30 @@ if st.sidebar.button("Find Prices", key="find_prices_btn"):
 
         st.sidebar.write(f"⏳ Searching for products matching: {search_query}...")
 
-        flipkart_url = f"https://www.flipkart.com/search?q={search_query.replace(' ', '+')}"
-        reliance_url = f"https://www.reliancedigital.in/products?q={search_query.replace(' ', '%20')}&page_no=1&page_size=12&page_type=number"
-        croma_url = f"https://www.croma.com/searchB?q={search_query.replace(' ', '%20')}%3Arelevance"
+        # Forget URLs from this session's previous search
+        session_key = st.session_state.session_key
+        product_url_registry.clear(session_key)
 
         # Set up WebDriver
         wd = setup_driver()
 
-        # Flipkart XPaths
-        flipkart_title_xpath = "//div[contains(@class, 'KzDlHZ')]"
-        flipkart_price_xpath = "//div[contains(@class, 'Nx9bqj')]"
-        flipkart_rating_xpath = "//div[contains(@class, 'XQDdHH')]"
-        flipkart_ratings_count_xpath = "//span[contains(@class, 'Wphh3N')]/span/span[1]"
-        product_link_xpath = "//div[@class='tUxRFH']//a[@class='CGtC98']"
-
-
-        # Croma XPaths
-        croma_title_xpath = "//h3[contains(@class, 'product-title')]"
-        croma_price_xpath = "//span[contains(@class, 'amount')]"
-        croma_product_link_xpath = "//div[contains(@class, 'product')]//a"
-        croma_rating_xpath = "//span[contains(@style, 'color')]"
-        croma_ratings_count_xpath = "//a[contains(@class, 'pr-review')]"
-
-        # Reliance XPaths
-        reliance_title_xpath = "//div[contains(@class, 'product-card-title')]"
-        reliance_price_xpath = "//div[contains(@class, 'price-container')]//div[contains(@class, 'price')]"
-        reliance_product_link_xpath = "//div[contains(@class, 'grid')]//a"
-        reliance_rating_xpath = "//span[contains(@class, 'rd-feedback-service-average-rating-total-count')]"
-        reliance_ratings_count_xpath = "//span[contains(@class, 'rd-feedback-service-jds-desk-body-s')]"
-
         # ✅ Fetch product data
         st.session_state.df_flipkart = pd.DataFrame(
-            fetch_flipkart_products(
-                        wd, flipkart_url, flipkart_title_xpath, flipkart_price_xpath, 
-                        flipkart_rating_xpath, flipkart_ratings_count_xpath, product_link_xpath
-                    )
-                    ,
+            fetch_retailer_products(wd, "Flipkart", search_query, session_key=session_key),
             columns=["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings"]
         )
         if not st.session_state.df_flipkart.empty:
             st.session_state.df_flipkart["Source"] = "Flipkart"  # ✅ Add source column
 
         st.session_state.df_reliance = pd.DataFrame(
-            fetch_reliance_products(wd, reliance_url, reliance_title_xpath, reliance_price_xpath, reliance_product_link_xpath, reliance_rating_xpath, reliance_ratings_count_xpath),
+            fetch_retailer_products(wd, "Reliance Digital", search_query, session_key=session_key),
             columns=["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings"]
         )
         if not st.session_state.df_reliance.empty:
             st.session_state.df_reliance["Source"] = "Reliance Digital"  # ✅ Add source column
 
         st.session_state.df_croma = pd.DataFrame(
-            fetch_croma_products(wd, croma_url, croma_title_xpath, croma_price_xpath, croma_product_link_xpath, croma_rating_xpath, croma_ratings_count_xpath),
+            fetch_retailer_products(wd, "Croma", search_query, session_key=session_key),
             columns=["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings"]
         )
         if not st.session_state.df_croma.empty:
@@ -92,10 +74,16 @@ if st.sidebar.button("Find Prices", key="find_prices_btn"):
 
         wd.quit()
 
-        # Combine all data and save for analysis
+        # Combine all data and add it to the stored history for analysis
         df_combined = pd.concat([st.session_state.df_flipkart, st.session_state.df_reliance, st.session_state.df_croma], ignore_index=True)
         if not df_combined.empty:
-            save_data_to_csv(df_combined)
+            # ✅ Rows already in the history (e.g. a repeated search) are not stored twice
+            df_new = store_rows(df_combined)
+
+            # ✅ Recompute recommendations only for the products that got new rows
+            df_cleaned = preprocess_data() if not df_new.empty else None
+            if df_cleaned is not None:
+                recommendation_table.refresh(df_cleaned, df_new["Product Title"].unique())
             st.sidebar.success("✅ Product Data Fetched!")
         else:
             st.sidebar.warning("⚠ No data found for the entered product.")
@@ -139,6 +127,7 @@ with tab2:
     if st.button("Analyze Data", key="analyze_data_btn"):
         df_cleaned = preprocess_data()
         if df_cleaned is not None:
+            recommendation_table.refresh(df_cleaned)
             st.success("✅ Data cleaned and stored successfully!")
         else:
             st.warning("⚠ No valid data found for analysis.")
@@ -189,6 +178,66 @@ with tab3:
                 st.success(f"✅ Recommended Selling Price: ₹{recommended_price:.2f}")
         else:
             st.warning("⚠ Please enter both cost price and product name.")
+
+    # 📈 Price Sensitivity Sweep - one fit, every cost price / weight / markup combination
+    st.subheader("📈 Price Sensitivity Sweep")
+
+    if "sweep_data" not in st.session_state:
+        st.session_state.sweep_data = None
+        st.session_state.sweep_product = None  # ✅ Product the stored sweep was computed for
+
+    col1, col2, col3 = st.columns(3)
+    sweep_min_cost = col1.number_input("Min Cost Price (₹)", min_value=1.0, value=1000.0, format="%.2f", key="sweep_min_cost")
+    sweep_max_cost = col2.number_input("Max Cost Price (₹)", min_value=1.0, value=20000.0, format="%.2f", key="sweep_max_cost")
+    sweep_cost_steps = col3.number_input("Cost Price Steps", min_value=2, max_value=200, value=20, key="sweep_cost_steps")
+    sweep_predicted = st.slider("Predicted Price Weight", 0.0, 1.0, (0.3, 0.7), 0.05, key="sweep_predicted")
+    sweep_competitor = st.slider("Competitor Price Weight", 0.0, 1.0, (0.1, 0.5), 0.05, key="sweep_competitor")
+    sweep_markup = st.slider("Cost Price Markup", 1.0, 3.0, (1.1, 1.5), 0.05, key="sweep_markup")
+
+    if st.button("Run Sweep", key="sweep_btn"):
+        if selected_product.strip() and sweep_max_cost >= sweep_min_cost:
+            # ✅ Drop the previous sweep, so a failed run never shows another product's grid
+            st.session_state.sweep_data = None
+            st.session_state.sweep_product = None
+            components = price_components(selected_product)
+            if components:
+                try:
+                    st.session_state.sweep_data = sweep_prices(
+                        *components,
+                        np.linspace(sweep_min_cost, sweep_max_cost, int(sweep_cost_steps)),
+                        np.arange(sweep_predicted[0], sweep_predicted[1] + 0.025, 0.05),
+                        np.arange(sweep_competitor[0], sweep_competitor[1] + 0.025, 0.05),
+                        np.arange(sweep_markup[0], sweep_markup[1] + 0.025, 0.05),
+                    )
+                    st.session_state.sweep_product = selected_product.strip()
+                except ValueError as e:
+                    st.warning(f"⚠ {e}")
+        else:
+            st.warning("⚠ Please enter a product name and a valid cost price range.")
+
+    sweep_data = st.session_state.sweep_data
+    if sweep_data is not None and st.session_state.sweep_product != selected_product.strip():
+        st.info(f"🔍 The last sweep was for '{st.session_state.sweep_product}'. Run the sweep again for this product.")
+    elif sweep_data is not None and not sweep_data.empty:
+        col1, col2 = st.columns(2)
+        surface_competitor = col1.selectbox("Competitor Weight (surface)", sorted(sweep_data["Competitor Weight"].unique()), key="surface_competitor")
+        surface_markup = col2.selectbox("Markup (surface)", sorted(sweep_data["Markup"].unique()), key="surface_markup")
+
+        surface = sweep_data[
+            (sweep_data["Competitor Weight"] == surface_competitor) & (sweep_data["Markup"] == surface_markup)
+        ].pivot(index="Predicted Weight", columns="Cost Price", values="Recommended Price")
+
+        # ✅ Only the selected slice is rendered, not the whole grid
+        if not surface.empty:
+            fig_sweep = go.Figure(data=[go.Surface(x=surface.columns, y=surface.index, z=surface.values)])
+            fig_sweep.update_layout(
+                title="Recommended Price by Cost Price and Predicted Weight",
+                scene=dict(xaxis_title="Cost Price (₹)", yaxis_title="Predicted Weight", zaxis_title="Recommended Price (₹)"),
+            )
+            st.plotly_chart(fig_sweep, use_container_width=True)
+            st.dataframe(surface)
+        else:
+            st.info("🔍 No valid weight combination for this selection.")
             
             
 # New session state for storing review data
@@ -206,9 +255,9 @@ with tab4:
 
             all_reviews = []
             
-            # Iterate over stored URLs and fetch reviews
-            for product, url in flipkart_product_urls.items():
-                reviews = fetch_reviews(wd, url, "//div[@class='ZmyHeo']//div[contains(@class, '')]")
+            # Iterate over this session's Flipkart URLs and fetch reviews
+            for product, url in product_url_registry.items(st.session_state.session_key, "Flipkart"):
+                reviews = fetch_reviews(wd, url, REVIEW_XPATHS["Flipkart"], retailer="Flipkart")
                 sentiments = [analyze_sentiment(review) for review in reviews]
 
                 for review, sentiment in zip(reviews, sentiments):
@@ -0,0 +1,240 @@
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing
+
+import pandas as pd
+
+
+# File to store the local crawl queue
+QUEUE_FILE = "crawl_queue.db"
+
+RESULT_COLUMNS = ["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings", "Source", "Job ID", "Completed At"]
+
+
+class CrawlQueue(ABC):
+    """
+    Work queue of (retailer, query, page) crawl jobs shared by crawler workers.
+
+    Workers lease a job for lease_seconds, heartbeat to keep it, and complete or
+    fail it. A job whose lease runs out is handed to the next worker, up to
+    max_attempts times. Backends (SQLite here, a Redis-style server elsewhere)
+    implement these methods.
+    """
+
+    @abstractmethod
+    def enqueue(self, retailer, query, page=1):
+        """
+        Adds a job unless the same (retailer, query, page) is already pending or leased.
+
+        A done or failed job is reset to pending with no attempts, so queries can be
+        re-crawled. Returns the job id.
+        """
+
+    @abstractmethod
+    def lease(self, worker_id, lease_seconds=120):
+        """Claims the next pending or expired job for worker_id, or returns None."""
+
+    @abstractmethod
+    def heartbeat(self, job_id, worker_id, lease_seconds=120):
+        """Extends the lease on a job. Returns False if the worker no longer holds it."""
+
+    @abstractmethod
+    def complete(self, job_id, worker_id, products):
+        """
+        Stores the scraped products for a job, marks it done and stamps the completion time.
+
+        Returns False, storing nothing, if worker_id no longer holds the lease.
+        """
+
+    @abstractmethod
+    def fail(self, job_id, worker_id, error):
+        """Releases a job for retry after an error, or marks it failed when out of attempts."""
+
+    @abstractmethod
+    def results(self, query=None, unexported_only=False):
+        """
+        Returns the products of done jobs with their "Job ID" and "Completed At", optionally
+        for one query.
+        """
+
+    @abstractmethod
+    def mark_exported(self, completions):
+        """
+        Records that the results of these (job id, completed at) pairs were written to the data store.
+
+        A job completed again since its results were read keeps its new results unexported.
+        """
+
+
+class SQLiteCrawlQueue(CrawlQueue):
+    """CrawlQueue backed by a local SQLite file, shared by workers on the same machine."""
+
+    def __init__(self, path=QUEUE_FILE, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    retailer TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    exported INTEGER NOT NULL DEFAULT 0,
+                    completed_at REAL,
+                    UNIQUE (retailer, query, page)
+                );
+                CREATE TABLE IF NOT EXISTS results (
+                    job_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    product TEXT NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                );
+            """)
+            # Queue files created before completion stamps
+            if "completed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN completed_at REAL")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, retailer, query, page=1):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (retailer, query, page) VALUES (?, ?, ?)",
+                    (retailer, query, page),
+                )
+                # Finished jobs are crawled again; pending and leased ones are left alone
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', worker_id = NULL, lease_until = NULL, "
+                    "attempts = 0, error = NULL, exported = 0, completed_at = NULL "
+                    "WHERE retailer = ? AND query = ? AND page = ? AND status IN ('done', 'failed')",
+                    (retailer, query, page),
+                )
+                job_id = conn.execute(
+                    "SELECT id FROM jobs WHERE retailer = ? AND query = ? AND page = ?",
+                    (retailer, query, page),
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def lease(self, worker_id, lease_seconds=120):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease expired after their last attempt can no longer be retried
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired' "
+                    "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                )
+                row = conn.execute(
+                    "SELECT id, retailer, query, page, attempts FROM jobs "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                job_id, retailer, query, page, attempts = row
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker_id = ?, lease_until = ?, attempts = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, attempts + 1, job_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return {"id": job_id, "retailer": retailer, "query": query, "page": page, "attempts": attempts + 1}
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=120):
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, products):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Only the current lease holder may finish the job
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL, exported = 0, completed_at = ? "
+                    "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                    (time.time(), job_id, worker_id),
+                )
+                if cursor.rowcount != 1:
+                    conn.execute("ROLLBACK")
+                    return False
+
+                # Rows are keyed by position, so a job finished twice is stored once
+                conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+                conn.executemany(
+                    "INSERT INTO results (job_id, position, product) VALUES (?, ?, ?)",
+                    [(job_id, position, json.dumps(product)) for position, product in enumerate(products)],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def fail(self, job_id, worker_id, error):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker_id = NULL, lease_until = NULL, error = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (self.max_attempts, str(error), job_id, worker_id),
+            )
+
+    def results(self, query=None, unexported_only=False):
+        sql = (
+            "SELECT jobs.id, jobs.completed_at, jobs.retailer, results.product FROM results JOIN jobs ON jobs.id = results.job_id "
+            "WHERE jobs.status = 'done'"
+        )
+        params = ()
+        if query is not None:
+            sql += " AND jobs.query = ?"
+            params = (query,)
+        if unexported_only:
+            sql += " AND jobs.exported = 0"
+        sql += " ORDER BY jobs.id, results.position"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return pd.DataFrame(
+            [json.loads(product) + [retailer, job_id, completed_at] for job_id, completed_at, retailer, product in rows],
+            columns=RESULT_COLUMNS,
+        )
+
+    def mark_exported(self, completions):
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "UPDATE jobs SET exported = 1 WHERE id = ? AND completed_at = ? AND status = 'done'",
+                [(int(job_id), float(completed_at)) for job_id, completed_at in completions],
+            )
+
+    def counts(self):
+        """Returns the number of jobs in each status."""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
@@ -0,0 +1,145 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+from crawl_queue import QUEUE_FILE, SQLiteCrawlQueue
+from fetch import RETAILER_FETCHERS, fetch_retailer_products, setup_driver
+
+
+# Function to queue every (retailer, page) job for a search query
+def enqueue_search(queue, query, pages=1, retailers=None):
+    return [
+        queue.enqueue(retailer, query, page)
+        for retailer in (retailers or RETAILER_FETCHERS)
+        for page in range(1, pages + 1)
+    ]
+
+
+def _keep_leased(queue, job_id, worker_id, lease_seconds, stop):
+    # Renew the lease well before it runs out until the job finishes
+    while not stop.wait(lease_seconds / 3):
+        if not queue.heartbeat(job_id, worker_id, lease_seconds):
+            break
+
+
+# Function to run a crawler worker that leases jobs until the queue is drained or max_jobs is hit
+def run_worker(queue, worker_id=None, lease_seconds=120, poll_interval=5, max_jobs=None, max_results=5, exit_when_idle=False):
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    wd = setup_driver()
+    processed = 0
+
+    try:
+        while max_jobs is None or processed < max_jobs:
+            job = queue.lease(worker_id, lease_seconds)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=_keep_leased, args=(queue, job["id"], worker_id, lease_seconds, stop), daemon=True
+            )
+            heartbeat.start()
+
+            try:
+                products = fetch_retailer_products(wd, job["retailer"], job["query"], job["page"], max_results=max_results)
+                errors = [product for product in products if product[0] == "Error"]
+                if errors:
+                    queue.fail(job["id"], worker_id, errors[0][2])
+                elif not queue.complete(job["id"], worker_id, products):
+                    print(f"[{worker_id}] Lost the lease on job {job['id']}, results discarded")
+            except Exception as e:
+                queue.fail(job["id"], worker_id, f"Error: {str(e)}")
+            finally:
+                stop.set()
+                heartbeat.join()
+
+            processed += 1
+            print(f"[{worker_id}] {job['retailer']} '{job['query']}' page {job['page']} (attempt {job['attempts']})")
+    finally:
+        wd.quit()
+
+    return processed
+
+
+# Function to add finished crawl results to the data file and refresh their recommendations
+def export_results(queue, query=None):
+    # analyze builds its Streamlit page on import, so workers only load it to export
+    from analyze import preprocess_data
+    from ingest import store_rows
+    from recommendation_table import recommendation_table
+
+    results = queue.results(query, unexported_only=True)
+    if results.empty:
+        return 0
+
+    # Rows already in the data file are skipped, so an export interrupted before
+    # mark_exported can simply be run again
+    df_new = store_rows(results.drop(columns=["Job ID", "Completed At"]))
+    queue.mark_exported(results[["Job ID", "Completed At"]].drop_duplicates().itertuples(index=False))
+
+    df = preprocess_data() if not df_new.empty else None
+    if df is not None:
+        recommendation_table.refresh(df, df_new["Product Title"].unique())
+    return len(df_new)
+
+
+def _worker_process(path, kwargs):
+    run_worker(SQLiteCrawlQueue(path), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed crawl queue for retailer search pages.")
+    parser.add_argument("--db", default=QUEUE_FILE, help="SQLite queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue search pages for a product query")
+    enqueue_parser.add_argument("query")
+    enqueue_parser.add_argument("--pages", type=int, default=1)
+    enqueue_parser.add_argument("--retailer", action="append", choices=list(RETAILER_FETCHERS))
+
+    work_parser = commands.add_parser("work", help="Run crawler workers against the queue")
+    work_parser.add_argument("--processes", type=int, default=1, help="Workers (one browser each) on this machine")
+    work_parser.add_argument("--lease-seconds", type=int, default=120)
+    work_parser.add_argument("--max-results", type=int, default=5)
+    work_parser.add_argument("--exit-when-idle", action="store_true")
+
+    export_parser = commands.add_parser("export", help="Append finished results to the product data file")
+    export_parser.add_argument("--query", help="Only export results for this query")
+
+    commands.add_parser("status", help="Show job counts by status")
+
+    args = parser.parse_args()
+    queue = SQLiteCrawlQueue(args.db)
+
+    if args.command == "enqueue":
+        job_ids = enqueue_search(queue, args.query, args.pages, args.retailer)
+        print(f"Queued {len(job_ids)} jobs for '{args.query}'.")
+    elif args.command == "work":
+        kwargs = {
+            "lease_seconds": args.lease_seconds,
+            "max_results": args.max_results,
+            "exit_when_idle": args.exit_when_idle,
+        }
+        workers = [
+            multiprocessing.Process(target=_worker_process, args=(args.db, kwargs))
+            for _ in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    elif args.command == "export":
+        print(f"Exported {export_results(queue, args.query)} new product rows.")
+    else:
+        print(queue.counts())
+
+
+if __name__ == "__main__":
+    main()
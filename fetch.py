@@ -9,6 +9,8 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import NoAlertPresentException
 import pandas as pd
 import re  # Import regular expressions for text extraction
+from url_registry import ProductURLRegistry
+from snapshot_archive import SnapshotArchive
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -33,16 +35,46 @@ def setup_driver():
     service = Service(ChromeDriverManager().install())
     return webdriver.Chrome(service=service, options=options)
 
-# Function to fetch product details from Flipkart
-# Dictionary to store product URLs separately
-flipkart_product_urls = {}
+# Registry to store product URLs separately, per session and retailer
+product_url_registry = ProductURLRegistry(max_size=1000, ttl=3600)
+
+# Archive of every raw page fetched, for re-parsing offline (created on first use)
+page_archive = None
+
+
+# Function to return the shared snapshot archive, creating it on first use
+def get_page_archive():
+    global page_archive
+    if page_archive is None:
+        page_archive = SnapshotArchive()
+    return page_archive
+
+
+# Function to store the current page's HTML in the snapshot archive
+def archive_page(wd, url, kind, retailer=None, query=None):
+    if getattr(wd, "offline", False):
+        return  # Replaying archived pages, nothing new to store
+    try:
+        get_page_archive().store(wd.page_source, url, kind, retailer, query)
+    except Exception as e:
+        print(f"Could not archive {url}: {e}")
+
+
+# Function to wait for an element and archive the page, even if the wait times out
+def wait_and_archive(wd, xpath, url, kind, retailer=None, query=None, timeout=10):
+    if getattr(wd, "offline", False):
+        timeout = 0  # Archived pages are complete, waiting cannot help
+    try:
+        WebDriverWait(wd, timeout).until(EC.presence_of_element_located((By.XPATH, xpath)))
+    finally:
+        archive_page(wd, url, kind, retailer, query)
 
 # Function to fetch product details from Flipkart
-def fetch_flipkart_products(wd, url, title_xpath, price_xpath, rating_xpath, ratings_count_xpath, product_link_xpath, max_results=5):
+def fetch_flipkart_products(wd, url, title_xpath, price_xpath, rating_xpath, ratings_count_xpath, product_link_xpath, max_results=5, session_key=None, query=None):
     products = []
     wd.get(url)
     try:
-        WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, title_xpath)))
+        wait_and_archive(wd, title_xpath, url, "listing", "Flipkart", query)
         
         titles = wd.find_elements(By.XPATH, title_xpath)
         prices = wd.find_elements(By.XPATH, price_xpath)
@@ -69,7 +101,7 @@ def fetch_flipkart_products(wd, url, title_xpath, price_xpath, rating_xpath, rat
             product_url = product_links[i].get_attribute("href") if i < len(product_links) else "URL Not Available"
 
             # Store the URL separately
-            flipkart_product_urls[title] = product_url
+            product_url_registry.register(session_key, "Flipkart", title, product_url)
 
             products.append((title, price, rating, ratings_count_text))
             count += 1
@@ -83,12 +115,12 @@ def fetch_flipkart_products(wd, url, title_xpath, price_xpath, rating_xpath, rat
 
 # Function to fetch product details from Croma without visiting product pages
 # Function to fetch product details from Croma
-def fetch_croma_products(wd, url, title_xpath, price_xpath, product_link_xpath, rating_xpath, ratings_count_xpath, max_results=5):
+def fetch_croma_products(wd, url, title_xpath, price_xpath, product_link_xpath, rating_xpath, ratings_count_xpath, max_results=5, session_key=None, query=None):
     products = []
     wd.get(url)
 
     try:
-        WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, title_xpath)))
+        wait_and_archive(wd, title_xpath, url, "listing", "Croma", query)
         
         titles = wd.find_elements(By.XPATH, title_xpath)
         prices = wd.find_elements(By.XPATH, price_xpath)
@@ -107,7 +139,7 @@ def fetch_croma_products(wd, url, title_xpath, price_xpath, product_link_xpath,
                 wd.switch_to.window(wd.window_handles[1])
 
                 try:
-                    WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, rating_xpath)))
+                    wait_and_archive(wd, rating_xpath, product_url, "detail", "Croma", query)
                     rating_text = wd.find_element(By.XPATH, rating_xpath).text.strip()
 
                     # Extract and clean Ratings Count
@@ -120,6 +152,7 @@ def fetch_croma_products(wd, url, title_xpath, price_xpath, product_link_xpath,
                 wd.close()
                 wd.switch_to.window(wd.window_handles[0])
 
+            product_url_registry.register(session_key, "Croma", title, product_url)
             products.append((title, price, rating_text, ratings_count_text))
     
     except Exception as e:
@@ -134,6 +167,8 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 
 def handle_popup(wd):
     """Handles unexpected popups dynamically"""
+    if getattr(wd, "offline", False):
+        return  # Archived pages have no live popups
     try:
         # Check for browser alerts (JavaScript popups)
         WebDriverWait(wd, 2).until(EC.alert_is_present())
@@ -159,7 +194,7 @@ def handle_popup(wd):
         except (TimeoutException, NoSuchElementException):
             pass  # No popup found, continue
 
-def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpath, rating_xpath, ratings_count_xpath, max_results=5):
+def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpath, rating_xpath, ratings_count_xpath, max_results=5, session_key=None, query=None):
     products = []
     wd.get(url)
 
@@ -167,7 +202,7 @@ def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpat
     handle_popup(wd)
 
     try:
-        WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, title_xpath)))
+        wait_and_archive(wd, title_xpath, url, "listing", "Reliance Digital", query)
         
         titles = wd.find_elements(By.XPATH, title_xpath)
         prices = wd.find_elements(By.XPATH, price_xpath)
@@ -189,7 +224,7 @@ def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpat
                 handle_popup(wd)
 
                 try:
-                    WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, rating_xpath)))
+                    wait_and_archive(wd, rating_xpath, product_url, "detail", "Reliance Digital", query)
                     full_rating_text = wd.find_element(By.XPATH, rating_xpath).text.strip()
                     rating_match = re.search(r'(\d+(\.\d+)?)', full_rating_text)
                     rating_text = rating_match.group(1) if rating_match else "N/A"
@@ -208,6 +243,7 @@ def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpat
                 if len(wd.window_handles) > 0:
                     wd.switch_to.window(wd.window_handles[0])
 
+            product_url_registry.register(session_key, "Reliance Digital", title, product_url)
             products.append((title, price, rating_text, ratings_count_text))
     
     except Exception as e:
@@ -215,15 +251,72 @@ def fetch_reliance_products(wd, url, title_xpath, price_xpath, product_link_xpat
 
     return products
 
+# XPaths for each retailer's search results and product pages
+RETAILER_XPATHS = {
+    "Flipkart": {
+        "title_xpath": "//div[contains(@class, 'KzDlHZ')]",
+        "price_xpath": "//div[contains(@class, 'Nx9bqj')]",
+        "rating_xpath": "//div[contains(@class, 'XQDdHH')]",
+        "ratings_count_xpath": "//span[contains(@class, 'Wphh3N')]/span/span[1]",
+        "product_link_xpath": "//div[@class='tUxRFH']//a[@class='CGtC98']",
+    },
+    "Croma": {
+        "title_xpath": "//h3[contains(@class, 'product-title')]",
+        "price_xpath": "//span[contains(@class, 'amount')]",
+        "product_link_xpath": "//div[contains(@class, 'product')]//a",
+        "rating_xpath": "//span[contains(@style, 'color')]",
+        "ratings_count_xpath": "//a[contains(@class, 'pr-review')]",
+    },
+    "Reliance Digital": {
+        "title_xpath": "//div[contains(@class, 'product-card-title')]",
+        "price_xpath": "//div[contains(@class, 'price-container')]//div[contains(@class, 'price')]",
+        "product_link_xpath": "//div[contains(@class, 'grid')]//a",
+        "rating_xpath": "//span[contains(@class, 'rd-feedback-service-average-rating-total-count')]",
+        "ratings_count_xpath": "//span[contains(@class, 'rd-feedback-service-jds-desk-body-s')]",
+    },
+}
+
+# XPaths for the review text on each retailer's product pages
+REVIEW_XPATHS = {
+    "Flipkart": "//div[@class='ZmyHeo']//div[contains(@class, '')]",
+}
+
+RETAILER_FETCHERS = {
+    "Flipkart": fetch_flipkart_products,
+    "Croma": fetch_croma_products,
+    "Reliance Digital": fetch_reliance_products,
+}
+
+
+# Function to build a retailer's search URL for a query and results page
+def build_search_url(retailer, query, page=1):
+    if retailer == "Flipkart":
+        url = f"https://www.flipkart.com/search?q={query.replace(' ', '+')}"
+        return url if page == 1 else f"{url}&page={page}"
+    if retailer == "Reliance Digital":
+        return f"https://www.reliancedigital.in/products?q={query.replace(' ', '%20')}&page_no={page}&page_size=12&page_type=number"
+    if retailer == "Croma":
+        url = f"https://www.croma.com/searchB?q={query.replace(' ', '%20')}%3Arelevance"
+        return url if page == 1 else f"{url}&currentPage={page - 1}"
+    raise ValueError(f"Unknown retailer: {retailer}")
+
+
+# Function to fetch one page of search results from any supported retailer
+def fetch_retailer_products(wd, retailer, query, page=1, max_results=5, session_key=None):
+    url = build_search_url(retailer, query, page)
+    return RETAILER_FETCHERS[retailer](
+        wd, url, **RETAILER_XPATHS[retailer], max_results=max_results, session_key=session_key, query=query
+    )
+
 # Function to fetch reviews from a product page
-def fetch_reviews(wd, url, review_xpath, max_reviews=3):
+def fetch_reviews(wd, url, review_xpath, max_reviews=3, retailer=None):
     """Fetches up to max_reviews from the given product page URL."""
     reviews = []
     wd.get(url)
 
     try:
         # Wait until the reviews section is loaded
-        WebDriverWait(wd, 10).until(EC.presence_of_element_located((By.XPATH, review_xpath)))
+        wait_and_archive(wd, review_xpath, url, "review", retailer)
         
         # Find review elements
         review_elements = wd.find_elements(By.XPATH, review_xpath)
@@ -0,0 +1,257 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from analyze import DATA_FILE, append_data_to_csv, normalize_data
+from recommendation_table import product_key, recommendation_table
+
+
+DATA_COLUMNS = ["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings", "Source"]
+REQUIRED_COLUMNS = ["Product Title", "Price"]
+
+# File to store the keys of ingested rows, for de-duplication without holding them in memory
+INDEX_FILE = "ingest_index.db"
+
+
+def read_feed(path, fmt=None, chunksize=50000):
+    """Returns an iterator of DataFrame chunks from a CSV or JSONL feed."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    if fmt == "jsonl":
+        return pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    return pd.read_csv(path, chunksize=chunksize, dtype=str)
+
+
+def row_keys(df):
+    """Hashes (title, source, price) so duplicate rows can be recognized across chunks."""
+    # Fixed dtypes, so the same row hashes alike whether it came from a CSV, JSONL or scrape
+    keys = pd.DataFrame({
+        "title": df["Product Title"].map(product_key).astype(object),
+        "source": df["Source"].astype("string").fillna("").astype(object),
+        "price": df["Price"].astype("float64").round(2),
+    })
+    # SQLite integers are signed 64-bit
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy().view(np.int64)
+
+
+def open_index(path=INDEX_FILE):
+    """Opens the on-disk key index used to de-duplicate ingested rows."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS row_keys (key INTEGER PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        CREATE TEMP TABLE IF NOT EXISTS touched (key TEXT PRIMARY KEY);
+    """)
+    return conn
+
+
+def _data_file_stamp():
+    stat = os.stat(DATA_FILE)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def sync_index(conn, chunksize=50000):
+    """
+    Makes the key index match the data file, streaming the file in chunks.
+
+    The index is rebuilt only when the data file was changed by something other
+    than append_new_rows (e.g. save_data_to_csv overwrote it), so repeated loads
+    skip the scan.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not os.path.exists(DATA_FILE):
+            conn.execute("DELETE FROM row_keys")
+            conn.execute("DELETE FROM meta")
+        else:
+            stamp = _data_file_stamp()
+            stored = conn.execute("SELECT value FROM meta WHERE name = 'data_file'").fetchone()
+            if not stored or stored[0] != stamp:
+                conn.execute("DELETE FROM row_keys")
+                for chunk in pd.read_csv(DATA_FILE, chunksize=chunksize, dtype=str):
+                    chunk = normalize_data(chunk).dropna(subset=["Price"])
+                    conn.executemany("INSERT OR IGNORE INTO row_keys (key) VALUES (?)", ((key,) for key in row_keys(chunk).tolist()))
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('data_file', ?)", (stamp,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def prepare_chunk(chunk, columns=None, source=None):
+    """Renames, normalizes and validates one feed chunk. Returns rows in DATA_FILE column order."""
+    if columns:
+        chunk = chunk.rename(columns=columns)
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Feed is missing required columns: {', '.join(missing)}")
+
+    for column in DATA_COLUMNS:
+        if column not in chunk.columns:
+            chunk[column] = np.nan
+    if source:
+        chunk["Source"] = chunk["Source"].fillna(source)
+
+    chunk = normalize_data(chunk[DATA_COLUMNS].copy())
+
+    # ✅ Drop rows without a usable title or price, and blank impossible ratings
+    chunk["Product Title"] = chunk["Product Title"].astype("string").str.strip()
+    chunk = chunk[chunk["Product Title"].notna() & (chunk["Product Title"] != "")]
+    chunk = chunk[chunk["Price"].notna() & (chunk["Price"] > 0)]
+    chunk.loc[~chunk["Rating (⭐ out of 5)"].between(0, 5), "Rating (⭐ out of 5)"] = np.nan
+    chunk["No. of Ratings"] = chunk["No. of Ratings"].clip(lower=0)
+
+    return chunk
+
+
+def append_new_rows(conn, rows):
+    """
+    Appends the prepared rows whose keys are not in the index yet, and returns them.
+
+    Rows already stored, or repeated within rows, are skipped. The keys are only
+    committed once the rows are in the data file, and the index write lock is held
+    throughout, so concurrent writers (the app, ingest.py, crawl_worker.py export)
+    cannot append the same row twice.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        is_new = np.array([
+            conn.execute("INSERT OR IGNORE INTO row_keys (key) VALUES (?)", (key,)).rowcount == 1
+            for key in row_keys(rows).tolist()
+        ], dtype=bool)
+        rows = rows[is_new]
+
+        if not rows.empty:
+            append_data_to_csv(rows)
+            # ✅ The index still matches the data file, so sync_index need not rescan it
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('data_file', ?)", (_data_file_stamp(),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return rows
+
+
+# Function to add scraped or crawled rows to the data file, skipping ones already stored
+def store_rows(df, index_path=INDEX_FILE):
+    conn = open_index(index_path)
+    try:
+        sync_index(conn)
+        return append_new_rows(conn, prepare_chunk(df))
+    finally:
+        conn.close()
+
+
+def _refresh_batch(rows):
+    rating = rows.groupby("key")["Rating (⭐ out of 5)"].transform("median")
+    rows["Rating (⭐ out of 5)"] = rows["Rating (⭐ out of 5)"].fillna(rating).fillna(4.0)
+    recommendation_table.refresh(rows.drop(columns=["key"]), complete=False)
+
+
+# Function to refresh the recommendation table for touched products without loading the whole data file
+def refresh_touched(conn, chunksize=50000):
+    # ✅ Stage every data file row of a touched product on disk, in file order
+    conn.execute("DROP TABLE IF EXISTS staged")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS chunk_keys (key TEXT PRIMARY KEY)")
+    for chunk in pd.read_csv(DATA_FILE, chunksize=chunksize, dtype=str):
+        chunk = normalize_data(chunk).dropna(subset=["Price"])
+        chunk["key"] = chunk["Product Title"].map(product_key)
+
+        conn.execute("DELETE FROM chunk_keys")
+        conn.executemany("INSERT OR IGNORE INTO chunk_keys (key) VALUES (?)", ((key,) for key in chunk["key"].unique()))
+        hits = {key for (key,) in conn.execute("SELECT key FROM chunk_keys JOIN touched USING (key)")}
+        chunk[chunk["key"].isin(hits)].to_sql("staged", conn, if_exists="append", index=False)
+
+    if not conn.execute("SELECT name FROM sqlite_master WHERE name = 'staged'").fetchone():
+        return
+
+    # ✅ Read the staged rows back grouped by product, one chunk at a time
+    carry = None
+    for chunk in pd.read_sql("SELECT * FROM staged ORDER BY key, rowid", conn, chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        # The last product may continue in the next chunk
+        last = chunk["key"] == chunk["key"].iloc[-1]
+        carry = chunk[last]
+        if not chunk[~last].empty:
+            _refresh_batch(chunk[~last].copy())
+    if carry is not None and not carry.empty:
+        _refresh_batch(carry.copy())
+
+    conn.execute("DROP TABLE staged")
+
+
+def invalidate_touched(conn, chunksize=50000):
+    """Drops the touched products from the recommendation table, to be recomputed on request."""
+    cursor = conn.execute("SELECT key FROM touched")
+    while True:
+        keys = [key for (key,) in cursor.fetchmany(chunksize)]
+        if not keys:
+            break
+        recommendation_table.invalidate(keys)
+
+
+# Function to stream a partner price feed into the data file in bounded-memory chunks
+def ingest_feed(path, fmt=None, chunksize=50000, columns=None, source=None, refresh_recommendations=False, index_path=INDEX_FILE):
+    conn = open_index(index_path)
+    totals = {"read": 0, "invalid": 0, "duplicate": 0, "appended": 0}
+    start = time.perf_counter()
+
+    try:
+        sync_index(conn, chunksize)
+
+        for chunk in read_feed(path, fmt, chunksize):
+            totals["read"] += len(chunk)
+            rows = prepare_chunk(chunk, columns, source)
+            totals["invalid"] += len(chunk) - len(rows)
+
+            # ✅ Skip rows already stored or repeated earlier in the feed
+            appended = append_new_rows(conn, rows)
+            totals["duplicate"] += len(rows) - len(appended)
+            totals["appended"] += len(appended)
+            conn.executemany(
+                "INSERT OR IGNORE INTO touched (key) VALUES (?)",
+                ((key,) for key in appended["Product Title"].map(product_key).unique()),
+            )
+
+            elapsed = time.perf_counter() - start
+            print(
+                f"{totals['read']:,} rows read | {totals['appended']:,} appended | "
+                f"{totals['duplicate']:,} duplicate | {totals['invalid']:,} invalid | "
+                f"{totals['read'] / elapsed:,.0f} rows/s"
+            )
+
+        # ✅ Materialized prices of touched products are stale either way
+        if refresh_recommendations and totals["appended"]:
+            refresh_touched(conn, chunksize)
+        else:
+            invalidate_touched(conn, chunksize)
+    finally:
+        conn.close()
+
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a partner price feed (CSV or JSONL) into the product data file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows held in memory at a time")
+    parser.add_argument("--map", action="append", default=[], metavar="FEED_COLUMN=COLUMN", help="Rename a feed column, e.g. name='Product Title'")
+    parser.add_argument("--source", help="Source name for rows that do not have one")
+    parser.add_argument("--refresh-recommendations", action="store_true", help="Recompute the recommendation table for ingested products instead of dropping their rows")
+    args = parser.parse_args()
+
+    columns = dict(mapping.split("=", 1) for mapping in args.map)
+    totals = ingest_feed(args.path, args.format, args.chunksize, columns, args.source, args.refresh_recommendations)
+    print(f"Done: {totals['appended']:,} of {totals['read']:,} rows appended in {totals['seconds']:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+
+
+# Group sizes below which the cheaper estimators are used
+MEDIAN_MAX_ROWS = 5
+RIDGE_MAX_ROWS = 50
+
+# Group size from which a warm-startable forest is used, so new rows can be folded in.
+# Scraped groups (a few rows per retailer per search) stay below this; it is meant
+# for feed-scale groups loaded with ingest.py, where a full 200-tree refit is costly.
+FOREST_MIN_ROWS = 1000
+
+# Warm starts that would add fewer trees than this, or grow the forest past
+# MAX_FOREST_TREES, fall back to a full refit
+MIN_NEW_TREES = 10
+MAX_FOREST_TREES = 400
+
+# Fallback features when a whole group is missing them (matches preprocess_data's rating default)
+DEFAULT_FEATURES = {"Log No. of Ratings": 0.0, "Rating (⭐ out of 5)": 4.0}
+
+# Blend of predicted price, competitor price and marked-up cost price
+PRICE_WEIGHTS = (0.5, 0.3, 0.2)
+COST_MARKUP = 1.2
+
+# Largest grid sweep_prices will compute
+MAX_SWEEP_COMBINATIONS = 100000
+
+
+class PercentilePriceModel(BaseEstimator, RegressorMixin):
+    """Closed-form baseline that predicts a fixed percentile of the training prices."""
+
+    def __init__(self, percentile=50):
+        self.percentile = percentile
+
+    def fit(self, X, y):
+        self.price_ = float(np.percentile(np.asarray(y, dtype=float), self.percentile))
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.price_)
+
+
+# Estimator factories offered by the model layer
+ESTIMATORS = {
+    "median": lambda: PercentilePriceModel(percentile=50),
+    "ridge": lambda: Ridge(alpha=1.0),
+    "hist_gradient_boosting": lambda: HistGradientBoostingRegressor(max_iter=100, random_state=42),
+    "random_forest": lambda: RandomForestRegressor(n_estimators=200, min_samples_split=5, random_state=42),
+}
+
+
+def build_features(df):
+    """Returns the model features (log ratings count and rating) for a product frame."""
+    features = pd.DataFrame(index=df.index)
+    features["Log No. of Ratings"] = np.log1p(df["No. of Ratings"])
+    features["Rating (⭐ out of 5)"] = df["Rating (⭐ out of 5)"]
+    return features.fillna(features.median()).fillna(DEFAULT_FEATURES)
+
+
+def select_model(n_rows):
+    """Picks the cheapest estimator that suits a group of n_rows training rows."""
+    if n_rows < MEDIAN_MAX_ROWS:
+        return ESTIMATORS["median"]()
+    if n_rows < RIDGE_MAX_ROWS:
+        return ESTIMATORS["ridge"]()
+    if n_rows < FOREST_MIN_ROWS:
+        return ESTIMATORS["hist_gradient_boosting"]()
+    return ESTIMATORS["random_forest"]()
+
+
+def fit_price_model(df, model=None):
+    """Fits a scaler and price model on df, choosing the model by group size if none is given."""
+    X = build_features(df)
+    y = df["Price"].fillna(df["Price"].median())
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    if model is None:
+        model = select_model(len(X))
+    model.fit(X_scaled, y)
+    return scaler, model
+
+
+def predict_price(scaler, model, df):
+    """Predicts prices for the rows of df with a model from fit_price_model."""
+    return model.predict(scaler.transform(build_features(df)))
+
+
+def blend_price(predicted_price, competitor_price, cost_price, weights=PRICE_WEIGHTS, markup=COST_MARKUP):
+    """Weights the predicted, competitor and marked-up cost prices into a recommended price."""
+    predicted_weight, competitor_weight, cost_weight = weights
+    return (predicted_price * predicted_weight) + (competitor_price * competitor_weight) + (cost_price * markup * cost_weight)
+
+
+def sweep_prices(predicted_price, competitor_price, cost_prices, predicted_weights, competitor_weights, markups):
+    """
+    Computes the recommended price over a grid of cost prices, blend weights and markups.
+
+    The cost weight of each combination is 1 - predicted_weight - competitor_weight;
+    combinations where that is negative are dropped. The whole grid is priced in one
+    vectorized blend_price call. Raises ValueError if the grid has more than
+    MAX_SWEEP_COMBINATIONS combinations.
+    """
+    n_combinations = len(cost_prices) * len(predicted_weights) * len(competitor_weights) * len(markups)
+    if n_combinations > MAX_SWEEP_COMBINATIONS:
+        raise ValueError(
+            f"Sweep has {n_combinations:,} combinations, the limit is {MAX_SWEEP_COMBINATIONS:,}. "
+            "Narrow the ranges or use fewer cost price steps."
+        )
+
+    cost, predicted_weight, competitor_weight, markup = (
+        grid.ravel() for grid in np.meshgrid(cost_prices, np.round(predicted_weights, 4), np.round(competitor_weights, 4), np.round(markups, 4), indexing="ij")
+    )
+    cost_weight = (1 - predicted_weight - competitor_weight).round(4)
+    valid = cost_weight >= 0
+
+    sweep = pd.DataFrame({
+        "Cost Price": cost[valid],
+        "Predicted Weight": predicted_weight[valid],
+        "Competitor Weight": competitor_weight[valid],
+        "Cost Weight": cost_weight[valid],
+        "Markup": markup[valid],
+    })
+    sweep["Recommended Price"] = blend_price(
+        predicted_price,
+        competitor_price,
+        sweep["Cost Price"].to_numpy(),
+        weights=(sweep["Predicted Weight"].to_numpy(), sweep["Competitor Weight"].to_numpy(), sweep["Cost Weight"].to_numpy()),
+        markup=sweep["Markup"].to_numpy(),
+    ).round(2)
+    return sweep
+
+
+def refit_forest(scaler, model, df_new, n_old_rows):
+    """
+    Grows a forest from fit_price_model with warm_start instead of refitting it.
+
+    The existing trees and the fitted scaler are kept, and extra trees are trained
+    on the new rows in df_new. The number of new trees is proportional to the new
+    rows' share of the group, so a small batch cannot outweigh the rows the forest
+    was built on. Returns None when the batch is too small for MIN_NEW_TREES or the
+    forest would exceed MAX_FOREST_TREES; the caller should then refit from scratch.
+    """
+    n_new_trees = round(model.n_estimators * len(df_new) / n_old_rows)
+    if n_new_trees < MIN_NEW_TREES or model.n_estimators + n_new_trees > MAX_FOREST_TREES:
+        return None
+
+    X_new = scaler.transform(build_features(df_new))
+    y_new = df_new["Price"].fillna(df_new["Price"].median())
+
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_trees)
+    model.fit(X_new, y_new)
+    return scaler, model
+
+
+def evaluate_models(df, estimators=None, n_splits=5):
+    """
+    Cross-validates each estimator on the price history in df.
+
+    Returns a DataFrame with the mean fit time, per-row predict latency, MAE and
+    RMSE of every estimator.
+    """
+    estimators = estimators or ESTIMATORS
+    X = build_features(df).to_numpy()
+    y = df["Price"].to_numpy(dtype=float)
+
+    n_splits = min(n_splits, len(df))
+    if n_splits < 2:
+        raise ValueError("At least two rows are needed to evaluate the models.")
+    folds = list(KFold(n_splits=n_splits, shuffle=True, random_state=42).split(X))
+
+    results = []
+    for name, factory in estimators.items():
+        fit_times, predict_times, errors = [], [], []
+        for train_idx, test_idx in folds:
+            scaler = StandardScaler()
+            X_train = scaler.fit_transform(X[train_idx])
+            X_test = scaler.transform(X[test_idx])
+            model = factory()
+
+            start = time.perf_counter()
+            model.fit(X_train, y[train_idx])
+            fit_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            predictions = model.predict(X_test)
+            predict_times.append((time.perf_counter() - start) / len(test_idx))
+
+            errors.append(y[test_idx] - predictions)
+
+        errors = np.concatenate(errors)
+        results.append({
+            "Estimator": name,
+            "Fit Time (ms)": np.mean(fit_times) * 1000,
+            "Predict Latency (ms/row)": np.mean(predict_times) * 1000,
+            "MAE": np.mean(np.abs(errors)),
+            "RMSE": np.sqrt(np.mean(errors ** 2)),
+        })
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    from analyze import preprocess_data
+
+    history = preprocess_data()
+    if history is None or history.empty:
+        print("No valid data available for evaluation.")
+    else:
+        print(evaluate_models(history).to_string(index=False))
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from sklearn.ensemble import RandomForestRegressor
+
+from pricing_model import blend_price, fit_price_model, predict_price, refit_forest
+
+
+# File to store the materialized recommendation inputs
+TABLE_FILE = "recommendation_table.db"
+
+# Number of fitted forests kept in memory for warm-start refreshes
+MAX_CACHED_MODELS = 32
+
+
+def product_key(title):
+    """Matches the exact-title lookup used by recommend_price."""
+    return str(title).lower().strip()
+
+
+class RecommendationTable:
+    """
+    Per-product predicted and competitor prices, kept up to date as scrapes land.
+
+    Only the cost-price weighting is applied at request time, so a lookup is a
+    single indexed read. refresh() recomputes just the products in a new batch;
+    products large enough for a forest grow their cached model with the new rows
+    instead of refitting it.
+
+    Rows live in SQLite and every read and write goes to the file, so the app,
+    ingest.py and crawl_worker.py export all see each other's updates and only
+    ever replace the products they touched.
+    """
+
+    def __init__(self, path=TABLE_FILE):
+        self.path = path
+        self._models = OrderedDict()
+        self._refresh_lock = threading.Lock()  # Guards the model cache while fitting
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recommendations (
+                    key TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    predicted_price REAL NOT NULL,
+                    competitor_price REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def refresh(self, df, titles=None, complete=True):
+        """
+        Recomputes the rows for the given titles from the preprocessed data in df.
+
+        With titles=None every product in df is recomputed. When df is the complete
+        data file (the default), products with no rows left in it are dropped, so the
+        table never outlives the data it was computed from; rows another process
+        wrote after this refresh started are kept. Pass complete=False when df only
+        holds the rows of the products being refreshed.
+        """
+        started = time.time()
+        keys = df["Product Title"].map(product_key)
+        present = set(keys)
+        wanted = present if titles is None else {product_key(title) for title in titles}
+
+        mask = keys.isin(wanted)
+        updated = []
+        with self._refresh_lock:
+            for key, group in df[mask].groupby(keys[mask]):
+                scaler, model = self._fit_group(key, group)
+                updated.append((
+                    key,
+                    group["Product Title"].iloc[0],
+                    float(predict_price(scaler, model, group.iloc[[0]])[0]),
+                    float(group["Price"].median()),
+                    started,
+                ))
+
+            if complete:
+                for key in [key for key in self._models if key not in present]:
+                    del self._models[key]
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM recommendations WHERE key = ?", ((key,) for key in wanted))
+                conn.executemany("INSERT INTO recommendations VALUES (?, ?, ?, ?, ?)", updated)
+                if complete:
+                    self._delete_missing(conn, present, started)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(updated)
+
+    def _delete_missing(self, conn, keep, before):
+        # Caller holds the write transaction
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (key TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM keep_keys")
+        conn.executemany("INSERT OR IGNORE INTO keep_keys (key) VALUES (?)", ((key,) for key in keep))
+        conn.execute(
+            "DELETE FROM recommendations WHERE updated < ? AND key NOT IN (SELECT key FROM keep_keys)",
+            (before,),
+        )
+
+    def retain(self, titles):
+        """Drops every product not in titles, e.g. after the data file was overwritten."""
+        started = time.time()
+        keep = {product_key(title) for title in titles}
+        with self._refresh_lock:
+            for key in [key for key in self._models if key not in keep]:
+                del self._models[key]
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_missing(conn, keep, started)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, titles):
+        """Drops the given products, so they are recomputed from the data on the next request."""
+        keys = {product_key(title) for title in titles}
+        with self._refresh_lock:
+            for key in keys:
+                self._models.pop(key, None)
+        with closing(self._connect()) as conn:
+            conn.executemany("DELETE FROM recommendations WHERE key = ?", ((key,) for key in keys))
+
+    def _fit_group(self, key, group):
+        # New rows are appended to the data file, so a cached forest has seen the
+        # first n_rows of the group and only the rows after them are new
+        cached = self._models.pop(key, None)
+        fitted = None
+        if cached is not None and len(group) == cached[2]:
+            fitted = cached[0], cached[1]
+        elif cached is not None and len(group) > cached[2]:
+            fitted = refit_forest(cached[0], cached[1], group.iloc[cached[2]:], cached[2])
+        scaler, model = fitted or fit_price_model(group)
+
+        if isinstance(model, RandomForestRegressor):
+            self._models[key] = (scaler, model, len(group))
+            while len(self._models) > MAX_CACHED_MODELS:
+                self._models.popitem(last=False)
+        return scaler, model
+
+    def lookup(self, title):
+        """Returns the materialized row for a product title, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT title, predicted_price, competitor_price, updated FROM recommendations WHERE key = ?",
+                (product_key(title),),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["Product Title", "Predicted Price", "Competitor Price", "Updated"], row))
+
+    def recommend(self, title, cost_price):
+        """Applies the cost-price weighting to a materialized product, or returns None."""
+        row = self.lookup(title)
+        if row is None:
+            return None
+        return round(blend_price(row["Predicted Price"], row["Competitor Price"], cost_price), 2)
+
+
+# Shared table used by the app
+recommendation_table = RecommendationTable()
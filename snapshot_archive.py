@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import zstandard
+
+
+# Directory to store raw page snapshots
+ARCHIVE_DIR = "snapshots"
+
+
+class SnapshotArchive:
+    """
+    Content-addressed archive of raw HTML pages fetched by the scrapers.
+
+    Each page is stored once as a zstd-compressed object named by its SHA-256
+    digest. A SQLite index records every fetch by retailer, query, page kind
+    ('listing', 'detail' or 'review'), URL and time.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, level=10):
+        self.root = root
+        self.level = level
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    digest TEXT NOT NULL,
+                    retailer TEXT,
+                    query TEXT,
+                    kind TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_lookup ON snapshots (retailer, query, fetched_at);
+                CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots (url, fetched_at);
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest[2:]}.html.zst")
+
+    def store(self, html, url, kind, retailer=None, query=None):
+        """Archives a page and indexes the fetch. Returns the content digest."""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(zstandard.ZstdCompressor(level=self.level).compress(data))
+            os.replace(tmp_path, path)
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO snapshots (digest, retailer, query, kind, url, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, retailer, query, kind, url, time.time()),
+            )
+        return digest
+
+    def load(self, digest):
+        """Returns the HTML of an archived page."""
+        with open(self._object_path(digest), "rb") as f:
+            return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+
+    def find(self, retailer=None, query=None, kind=None, since=None, until=None):
+        """Returns index entries matching the given filters, oldest first."""
+        conditions, params = [], []
+        for column, value in (("retailer", retailer), ("query", query), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("fetched_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("fetched_at <= ?")
+            params.append(until)
+
+        sql = "SELECT * FROM snapshots"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY fetched_at, id"
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def latest(self, url, until=None):
+        """Returns the newest index entry for a URL, fetched no later than until if given."""
+        sql = "SELECT * FROM snapshots WHERE url = ?"
+        params = [url]
+        if until is not None:
+            sql += " AND fetched_at <= ?"
+            params.append(until)
+        sql += " ORDER BY fetched_at DESC, id DESC LIMIT 1"
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
@@ -0,0 +1,216 @@
+import argparse
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from urllib.parse import urljoin
+
+import lxml.html
+import pandas as pd
+from selenium.common.exceptions import NoAlertPresentException, NoSuchElementException
+from selenium.webdriver.common.by import By
+
+from fetch import RETAILER_FETCHERS, RETAILER_XPATHS, REVIEW_XPATHS, fetch_reviews
+from snapshot_archive import ARCHIVE_DIR, SnapshotArchive
+
+
+# Detail pages are matched to the newest snapshot taken within this many seconds of their listing
+DETAIL_WINDOW = 3600
+
+REPLAY_COLUMNS = ["Product Title", "Price", "Rating (⭐ out of 5)", "No. of Ratings", "Source", "Query", "Fetched At"]
+REVIEW_REPLAY_COLUMNS = ["Product URL", "Review", "Source", "Fetched At"]
+
+
+class SnapshotElement:
+    """Wraps an lxml element with the parts of the Selenium WebElement API the extractors use."""
+
+    def __init__(self, element, base_url):
+        self._element = element
+        self._base_url = base_url
+
+    @property
+    def text(self):
+        return re.sub(r"\s+", " ", self._element.text_content()).strip()
+
+    def get_attribute(self, name):
+        value = self._element.get(name)
+        if value is not None and name in ("href", "src"):
+            return urljoin(self._base_url, value)
+        return value
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    @property
+    def alert(self):
+        raise NoAlertPresentException()
+
+    def window(self, handle):
+        self._driver._current = handle
+
+
+class SnapshotDriver:
+    """
+    Read-only stand-in for a Selenium WebDriver that serves pages from the archive.
+
+    The fetch.py extractors run on it unchanged, so archived pages can be
+    re-parsed with new XPaths without a browser or network access.
+    """
+
+    offline = True
+
+    def __init__(self, archive, pinned=None, until=None):
+        self._archive = archive
+        self._pinned = pinned or {}
+        self._until = until
+        self._windows = {}
+        self._next_handle = 0
+        self._current = self._open_window(None)
+        self.switch_to = _SwitchTo(self)
+
+    def _open_window(self, url):
+        handle = f"snapshot-{self._next_handle}"
+        self._next_handle += 1
+        self._windows[handle] = self._load(url)
+        return handle
+
+    def _load(self, url):
+        html = "<html></html>"
+        if url is not None:
+            digest = self._pinned.get(url)
+            if digest is None:
+                entry = self._archive.latest(url, self._until)
+                digest = entry["digest"] if entry else None
+            if digest is not None:
+                html = self._archive.load(digest)
+        return url, html, lxml.html.fromstring(html)
+
+    def get(self, url):
+        self._windows[self._current] = self._load(url)
+
+    @property
+    def current_url(self):
+        return self._windows[self._current][0]
+
+    @property
+    def page_source(self):
+        return self._windows[self._current][1]
+
+    @property
+    def window_handles(self):
+        return list(self._windows)
+
+    def find_elements(self, by, value):
+        if by != By.XPATH:
+            raise ValueError(f"Snapshot replay only supports XPath locators, got {by}")
+        url, _, document = self._windows[self._current]
+        return [
+            SnapshotElement(element, url)
+            for element in document.xpath(value)
+            if isinstance(element, lxml.html.HtmlElement)
+        ]
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"No archived element matches {value}")
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        match = re.search(r"window\.open\('(.*)'\)", script)
+        if match:
+            self._open_window(match.group(1))
+
+    def close(self):
+        del self._windows[self._current]
+
+    def quit(self):
+        self._windows.clear()
+
+
+def _replay_listing(root, max_results, snapshot):
+    archive = SnapshotArchive(root)
+    retailer = snapshot["retailer"]
+    driver = SnapshotDriver(
+        archive,
+        pinned={snapshot["url"]: snapshot["digest"]},
+        until=snapshot["fetched_at"] + DETAIL_WINDOW,
+    )
+    products = RETAILER_FETCHERS[retailer](
+        driver, snapshot["url"], **RETAILER_XPATHS[retailer], max_results=max_results
+    )
+    return [
+        list(product) + [retailer, snapshot["query"], snapshot["fetched_at"]]
+        for product in products
+    ]
+
+
+def _replay_review(root, max_reviews, snapshot):
+    driver = SnapshotDriver(SnapshotArchive(root), pinned={snapshot["url"]: snapshot["digest"]})
+    reviews = fetch_reviews(driver, snapshot["url"], REVIEW_XPATHS[snapshot["retailer"]], max_reviews=max_reviews)
+    return [
+        [snapshot["url"], review, snapshot["retailer"], snapshot["fetched_at"]]
+        for review in reviews
+    ]
+
+
+# Function to re-run fetch_reviews over archived review pages in parallel
+def replay_reviews(root=ARCHIVE_DIR, retailer=None, since=None, until=None, processes=None, max_reviews=3):
+    snapshots = [
+        snapshot
+        for snapshot in SnapshotArchive(root).find(retailer, None, "review", since, until)
+        if snapshot["retailer"] in REVIEW_XPATHS
+    ]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        rows = [
+            row
+            for page_rows in executor.map(partial(_replay_review, root, max_reviews), snapshots)
+            for row in page_rows
+        ]
+
+    return pd.DataFrame(rows, columns=REVIEW_REPLAY_COLUMNS)
+
+
+# Function to re-run the extractors over archived listing pages (and their detail pages) in parallel
+def replay(root=ARCHIVE_DIR, retailer=None, query=None, since=None, until=None, processes=None, max_results=5):
+    snapshots = [
+        snapshot
+        for snapshot in SnapshotArchive(root).find(retailer, query, "listing", since, until)
+        if snapshot["retailer"] in RETAILER_FETCHERS
+    ]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        rows = [
+            row
+            for listing_rows in executor.map(partial(_replay_listing, root, max_results), snapshots)
+            for row in listing_rows
+        ]
+
+    return pd.DataFrame(rows, columns=REPLAY_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived retailer pages offline.")
+    parser.add_argument("--root", default=ARCHIVE_DIR, help="Snapshot archive directory")
+    parser.add_argument("--kind", choices=["listing", "review"], default="listing", help="Listings include their detail pages")
+    parser.add_argument("--retailer", choices=list(RETAILER_FETCHERS))
+    parser.add_argument("--query")
+    parser.add_argument("--since", type=float, help="Only pages fetched at or after this Unix time")
+    parser.add_argument("--until", type=float, help="Only pages fetched at or before this Unix time")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--max-results", type=int, default=5, help="Products per listing, or reviews per review page")
+    parser.add_argument("--output", default="replay_data.csv")
+    args = parser.parse_args()
+
+    if args.kind == "review":
+        df = replay_reviews(args.root, args.retailer, args.since, args.until, args.processes, args.max_results)
+    else:
+        df = replay(args.root, args.retailer, args.query, args.since, args.until, args.processes, args.max_results)
+    df.to_csv(args.output, index=False)
+    print(f"Re-parsed {len(df)} {args.kind} rows into {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_product(title):
+    """Normalizes a product title so the same listing maps to one registry entry."""
+    return re.sub(r"\s+", " ", str(title)).strip().lower()
+
+
+class ProductURLRegistry:
+    """
+    Thread-safe store of product page URLs keyed by (session, retailer, product).
+
+    Entries are evicted least-recently-used once max_size is reached and expire
+    after ttl seconds. When persist_path is given the registry is loaded from and
+    saved to that JSON file.
+    """
+
+    def __init__(self, max_size=1000, ttl=3600, persist_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["time"] > self.ttl
+
+    def _evict(self, now):
+        # Caller must hold the lock
+        for key in [k for k, entry in self._entries.items() if self._expired(entry, now)]:
+            del self._entries[key]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def register(self, session_key, retailer, title, url):
+        """Stores the URL for a product seen in the given session's search results."""
+        if not url or url == "URL Not Available":
+            return
+
+        key = (session_key, retailer, canonical_product(title))
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"title": title, "url": url, "time": now}
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+        if self.persist_path:
+            self.save()
+
+    def get(self, session_key, retailer, title):
+        """Returns the stored URL for a product, or None if missing or expired."""
+        key = (session_key, retailer, canonical_product(title))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry["url"]
+
+    def items(self, session_key, retailer=None):
+        """Returns (title, url) pairs for a session, optionally for a single retailer."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            return [
+                (entry["title"], entry["url"])
+                for (session, source, _), entry in self._entries.items()
+                if session == session_key and (retailer is None or source == retailer)
+            ]
+
+    def clear(self, session_key=None):
+        """Removes every entry for a session, or the whole registry if no session is given."""
+        with self._lock:
+            if session_key is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == session_key]:
+                    del self._entries[key]
+
+        if self.persist_path:
+            self.save()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def save(self):
+        """Writes the registry to persist_path atomically."""
+        with self._lock:
+            data = [[list(key), entry] for key, entry in self._entries.items()]
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+
+    def load(self):
+        """Reads entries from persist_path, dropping any that have already expired."""
+        try:
+            with open(self.persist_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        with self._lock:
+            self._entries.clear()
+            for key, entry in data:
+                self._entries[tuple(key)] = entry
+            self._evict(now)